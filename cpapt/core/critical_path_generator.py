@@ -1,5 +1,6 @@
-
-from typing import Optional
+import os
+import copy
+from typing import Optional, Dict, Tuple, Any
 from tmll.tmll_client import TMLLClient
 from tmll.ml.modules.custom.critical_path_module import CriticalPathAnalysisModule
 
@@ -11,7 +12,24 @@ class CriticalPathGenerator:
         self.resample_freq = resample_freq
         self.hotspots_top_n = hotspots_top_n
 
+        # (trace path, trace mtime, resample_freq, hotspots_top_n) -> analysis results
+        self._cache: Dict[Tuple, Tuple[Any, Any, Any]] = {}
+
+    def _cache_key(self, trace_json_path: str) -> Optional[Tuple]:
+        try:
+            mtime_ns = os.stat(trace_json_path).st_mtime_ns
+        except OSError:
+            # Not a local file, so there is no way to tell whether it changed
+            return None
+
+        return (os.path.abspath(trace_json_path), mtime_ns, self.resample_freq, self.hotspots_top_n)
+
     def get_critical_path(self, trace_json_path: str, experiment_name: Optional[str] = None):
+        cache_key = self._cache_key(trace_json_path)
+        if cache_key in self._cache:
+            # Callers may modify the returned dicts and DataFrames, so hand out copies
+            return copy.deepcopy(self._cache[cache_key])
+
         if experiment_name is None:
             experiment_name = f"critical_path_{trace_json_path.split('/')[-1].split('.')[0]}"
 
@@ -29,4 +47,8 @@ class CriticalPathGenerator:
         function_stats = cpa.get_function_statistics()
         function_hotspots = cpa.get_hotspot_functions(top_n=self.hotspots_top_n)
 
+        # An empty or failed analysis may succeed on a retry, so only successful results are kept
+        if cache_key is not None and critical_path and 'error' not in critical_path:
+            self._cache[cache_key] = copy.deepcopy((critical_path, function_stats, function_hotspots))
+
         return critical_path, function_stats, function_hotspots
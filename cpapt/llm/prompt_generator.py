@@ -1,6 +1,7 @@
 from collections import defaultdict
-import json
-from typing import Dict, Any, List
+import io
+import ujson
+from typing import Dict, Any, List, TextIO
 from jinja2 import Environment, BaseLoader
 
 from cpapt.llm.config.prompt_templates import PERFORMANCE_TEST_GENERATION_PROMPT
@@ -13,33 +14,64 @@ class PerformancePromptGenerator:
         self.template_data = {"performance_test_generation_prompt": PERFORMANCE_TEST_GENERATION_PROMPT}
         self.jinja_env = Environment(loader=BaseLoader())
 
-    def _format_critical_path_data(self, critical_path_data: Dict[str, Any]) -> str:
-        """Format the critical path JSON data for the prompt."""
-        return json.dumps(critical_path_data, indent=2, ensure_ascii=False)
-
-    def _extract_source_files_section(self, critical_path_data: Dict[str, Any]) -> str:
-        """Extract and format source code from the critical path data."""
-        file_sources = defaultdict(list)
-
-        # Extract source code from critical path functions
-        if 'critical_path' in critical_path_data and 'critical_path' in critical_path_data['critical_path']:
-            functions = critical_path_data['critical_path']['critical_path'].get('functions', [])
+        prompt_config = self.template_data.get('performance_test_generation_prompt', {})
 
-            for func in functions:
-                source_code_info = func.get('source_code', {})
-                source_file = source_code_info.get('source_file', 'unknown.c')
-                code = source_code_info.get('code', '')
+        if not prompt_config:
+            raise ValueError("No 'performance_test_generation_prompt' section found in template")
 
-                if code:
-                    file_sources[source_file].append(code)
+        # Compile the templates once; generate_prompt only renders them
+        system_prompt = prompt_config.get('system', '')
+        user_prompt = prompt_config.get('user', '')
+        self._system_template = self.jinja_env.from_string(system_prompt) if system_prompt else None
+        self._user_template = self.jinja_env.from_string(user_prompt) if user_prompt else None
+
+    def _project_critical_path(self, critical_path_data: Dict[str, Any],
+                               functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Keep only the parts of the critical path data that are relevant to the prompt."""
+        projection = {}
+        for key, value in critical_path_data.items():
+            if key in ('execution_context', 'input_params'):
+                projection[key] = value
+            elif key == 'critical_path' and isinstance(value, dict):
+                projected_path = {}
+                for path_key, path_value in value.items():
+                    if path_key in ('summary', 'bottlenecks'):
+                        projected_path[path_key] = path_value
+                    elif path_key == 'critical_path':
+                        projected_path[path_key] = {'functions': functions}
+                projection[key] = projected_path
+
+        return projection
+
+    def _project_function(self, func: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep the timing and location fields of a critical path function."""
+        function_info = {key: func[key] for key in ('function_name', 'duration_us', 'self_time_ns') if key in func}
+
+        # The code itself is already part of the source files section
+        source_code_info = func.get('source_code', {})
+        location = {key: source_code_info[key] for key in ('source_file', 'line_number') if key in source_code_info}
+        if location:
+            function_info['source_code'] = location
+
+        return function_info
+
+    def _format_critical_path_data(self, critical_path_data: Dict[str, Any],
+                                   functions: List[Dict[str, Any]]) -> str:
+        """Format the critical path JSON data for the prompt."""
+        projection = self._project_critical_path(critical_path_data, functions)
+        return ujson.dumps(projection, indent=2, ensure_ascii=False, escape_forward_slashes=False)
 
-        output = []
+    def _format_source_files_section(self, file_sources: Dict[str, Dict[str, None]]) -> str:
+        """Format the source code of the critical path functions, grouped by file."""
+        output = io.StringIO()
         for source_file, codes in file_sources.items():
-            output.append(f"File: {source_file}\n" + "="*50)
+            if output.tell():
+                output.write("\n")
+            output.write(f"File: {source_file}\n" + "="*50)
             for code in codes:
-                output.append(f"{code}\n")
+                output.write(f"\n{code}\n")
 
-        return "\n".join(output) if output else ""
+        return output.getvalue()
 
     def _extract_build_context_section(self, critical_path_data: Dict[str, Any]) -> str:
         """Extract build context information."""
@@ -59,72 +91,81 @@ class PerformancePromptGenerator:
 
         return "\n".join(context_info) if context_info else ""
 
-    def _get_critical_functions_summary(self, critical_path_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Extract critical functions information for easy access."""
-        functions = []
+    def _build_prompt_sections(self, critical_path_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the prompt sections with a single pass over the critical path functions."""
+        # Source file -> code snippets, kept in order and without duplicates
+        file_sources = defaultdict(dict)
+        projected_functions = []
 
         if 'critical_path' in critical_path_data and 'critical_path' in critical_path_data['critical_path']:
-            cp_functions = critical_path_data['critical_path']['critical_path'].get('functions', [])
+            functions = critical_path_data['critical_path']['critical_path'].get('functions', [])
 
-            for func in cp_functions:
-                function_info = {
-                    'name': func.get('function_name', 'unknown'),
-                    'duration_us': func.get('duration_us', 0),
-                    'self_time_ns': func.get('self_time_ns', 0),
-                    'source_code': func.get('source_code', {}).get('code', ''),
-                    'line_number': func.get('source_code', {}).get('line_number', 0)
-                }
-                functions.append(function_info)
+            for func in functions:
+                source_code_info = func.get('source_code', {})
+                code = source_code_info.get('code', '')
 
-        return functions
+                if code:
+                    file_sources[source_code_info.get('source_file', 'unknown.c')][code] = None
 
-    def generate_prompt(self, critical_path_file: str, additional_instructions: str = "", max_tests: int = 4) -> str:
-        """
-        Generate the complete prompt by filling in the template with data.
-        """
+                projected_functions.append(self._project_function(func))
+
+        return {
+            'critical_path_data': self._format_critical_path_data(critical_path_data, projected_functions),
+            'source_files_section': self._format_source_files_section(file_sources),
+            'build_context_section': self._extract_build_context_section(critical_path_data)
+        }
+
+    def _load_template_vars(self, critical_path_file: str, additional_instructions: str, max_tests: int) -> Dict[str, Any]:
+        """Load the critical path file and build the variables the templates are rendered with."""
         try:
-            with open(critical_path_file, 'r', encoding='utf-8') as f:
-                critical_path_data = json.load(f)
+            with open(critical_path_file, 'rb') as f:
+                critical_path_data = ujson.load(f)
         except FileNotFoundError:
             raise FileNotFoundError(f"Critical path file not found: {critical_path_file}")
-        except json.JSONDecodeError as e:
+        except ujson.JSONDecodeError as e:
             raise ValueError(f"Error parsing JSON file: {e}")
 
-        template_vars = {
-            'critical_path_data': self._format_critical_path_data(critical_path_data),
-            'source_files_section': self._extract_source_files_section(critical_path_data),
-            'build_context_section': self._extract_build_context_section(critical_path_data),
+        return {
+            **self._build_prompt_sections(critical_path_data),
             'additional_instructions_text': additional_instructions,
             'language': self.language,
             'max_tests': max_tests
         }
 
-        prompt_config = self.template_data.get('performance_test_generation_prompt', {})
+    def _write_prompt(self, template_vars: Dict[str, Any], output: TextIO):
+        """Stream the rendered templates into a text file object, chunk by chunk."""
+        if self._system_template and self._user_template:
+            output.write("SYSTEM:\n")
+            self._system_template.stream(**template_vars).dump(output)
+            output.write("\n\nUSER:\n")
+            self._user_template.stream(**template_vars).dump(output)
+        elif self._user_template:
+            self._user_template.stream(**template_vars).dump(output)
+        elif self._system_template:
+            self._system_template.stream(**template_vars).dump(output)
 
-        if not prompt_config:
-            raise ValueError("No 'performance_test_generation_prompt' section found in template")
+    def generate_prompt(self, critical_path_file: str, additional_instructions: str = "", max_tests: int = 4) -> str:
+        """
+        Generate the complete prompt by filling in the template with data.
+        """
+        template_vars = self._load_template_vars(critical_path_file, additional_instructions, max_tests)
 
-        system_prompt = prompt_config.get('system', '')
-        user_prompt = prompt_config.get('user', '')
+        prompt = io.StringIO()
+        self._write_prompt(template_vars, prompt)
+        return prompt.getvalue()
+
+    def generate_prompt_to_file(self, critical_path_file: str, output_file: str,
+                                additional_instructions: str = "", max_tests: int = 4):
+        """
+        Generate the complete prompt and stream it to a file, without building the whole prompt in memory.
+        """
+        template_vars = self._load_template_vars(critical_path_file, additional_instructions, max_tests)
 
-        if system_prompt:
-            system_template = self.jinja_env.from_string(system_prompt)
-            rendered_system = system_template.render(**template_vars)
-        else:
-            rendered_system = ""
-
-        if user_prompt:
-            user_template = self.jinja_env.from_string(user_prompt)
-            rendered_user = user_template.render(**template_vars)
-        else:
-            rendered_user = ""
-
-        if rendered_system and rendered_user:
-            return f"SYSTEM:\n{rendered_system}\n\nUSER:\n{rendered_user}"
-        elif rendered_user:
-            return rendered_user
-        else:
-            return rendered_system
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                self._write_prompt(template_vars, f)
+        except OSError as e:
+            raise IOError(f"Error saving prompt to file: {e}")
 
     def save_prompt(self, prompt: str, output_file: str):
         """Save the generated prompt to a file."""
@@ -1,9 +1,156 @@
 import re
 import os
-from typing import Optional, List, Tuple
+import mmap
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import accumulate, repeat
+from typing import Optional, List, Tuple, Dict
 from pathlib import Path
 
 
+# String/char literals are matched so that comment markers inside them are
+# skipped; unterminated block comments run to the end of the content.
+_COMMENT_RE = re.compile(r'(?P<literal>"(?:\\.|[^"\\\n])*"'
+                         r"|'(?:\\.|[^'\\\n])*')"
+                         r'|//[^\n]*'
+                         r'|/\*.*?(?:\*/|\Z)', re.DOTALL)
+
+# Same as _COMMENT_RE but also matching C++ raw string literals; it is several
+# times slower, so it is only used for content that contains one
+_RAW_STRING_COMMENT_RE = re.compile(r'(?P<literal>\b(?:u8|[uUL])?R"(?P<delimiter>[^()\\\s"]{0,16})\(.*?\)(?P=delimiter)"'
+                                    r'|"(?:\\.|[^"\\\n])*"'
+                                    r"|'(?:\\.|[^'\\\n])*')"
+                                    r'|//[^\n]*'
+                                    r'|/\*.*?(?:\*/|\Z)', re.DOTALL)
+
+# Any identifier followed by an opening parenthesis, possibly on the next line
+_CALL_RE = re.compile(r'\b(\w+)\s*\(')
+
+# Names _CALL_RE can index; others (e.g. Foo::bar, operator==, ~Foo) are looked up file by file
+_IDENTIFIER_RE = re.compile(r'\w+')
+
+_BRACE_RE = re.compile(r'[{}]')
+
+_NON_NEWLINE_RE = re.compile(r'[^\n]')
+
+_FUNCTION_SIGNATURE_RE = re.compile(r'''
+    (?:^|\n)                    # Start of line
+    \s*                         # Optional whitespace
+    (?:static\s+|extern\s+|inline\s+)*  # Optional storage specifiers
+    (\w+(?:\s*\*+\s*|\s+))      # Return type (group 1)
+    (\w+)                       # Function name (group 2)
+    \s*\(                       # Opening parenthesis
+    ([^{;]*)                    # Parameters (group 3)
+    \)\s*                       # Closing parenthesis
+    (?=\{)                      # Followed by opening brace (lookahead)
+''', re.MULTILINE | re.VERBOSE)
+
+
+@lru_cache(maxsize=1024)
+def _function_name_pattern(function_name: str) -> re.Pattern:
+    return re.compile(rf'\b{re.escape(function_name)}\s*\(')
+
+
+def _comment_pattern(content: str) -> re.Pattern:
+    return _RAW_STRING_COMMENT_RE if 'R"' in content else _COMMENT_RE
+
+
+def _replace_comment(match: re.Match) -> str:
+    text = match.group(0)
+    if match.group('literal') is not None:
+        return text
+    return '\n' * text.count('\n')
+
+
+def _blank_literal_or_comment(match: re.Match) -> str:
+    text = match.group(0)
+    if '\n' not in text:
+        return ' ' * len(text)
+    return _NON_NEWLINE_RE.sub(' ', text)
+
+
+# Below this many files, list_all_functions parses serially even when a process pool was requested
+_PARALLEL_MIN_FILES = 64
+
+
+def _read_file(filepath: Path) -> str:
+    """Read a source file, decoding straight from a memory map instead of copying it into a bytes buffer first"""
+    with open(filepath, 'rb') as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                content = str(mapped, 'utf-8', 'ignore')
+        except ValueError:
+            # Empty files cannot be mapped
+            return ''
+        except OSError:
+            # Some file systems (e.g. FUSE or network mounts) do not support mapping
+            content = None
+
+    if content is None:
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as file:
+            return file.read()
+
+    # Same newline handling as reading in text mode
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+def _list_functions_in_content(content: str) -> List[Tuple[str, str]]:
+    """Extract all function signatures from the content of a file"""
+    matches = _FUNCTION_SIGNATURE_RE.finditer(content)
+    functions = []
+
+    for match in matches:
+        return_type = match.group(1).strip()
+        function_name = match.group(2).strip()
+        params = match.group(3).strip()
+
+        signature = f"{function_name}({params})" if params else f"{function_name}()"
+        functions.append((function_name, signature))
+
+    return functions
+
+
+def _list_functions_in_file_worker(filepath: Path, remove_comments: bool) -> Optional[List[Tuple[str, str]]]:
+    """Process pool counterpart of FunctionExtractor._list_functions_in_file, returning None for unreadable files"""
+    try:
+        content = _read_file(filepath)
+    except (UnicodeDecodeError, PermissionError):
+        return None
+
+    if remove_comments:
+        content = _comment_pattern(content).sub(_replace_comment, content)
+
+    return _list_functions_in_content(content)
+
+
+class _SourceFile:
+    """Content of a source file along with the views used to extract functions from it"""
+
+    def __init__(self, mtime_ns: int, content: str):
+        self.mtime_ns = mtime_ns
+        self.content = content
+        self.lines = content.split('\n')
+        # Function name -> line indexes of its declarations, filled in by FunctionExtractor
+        self.declarations: Optional[Dict[str, List[int]]] = None
+
+    # The views below are only needed for files a function is extracted from,
+    # so they are built on first use rather than for every scanned file
+
+    @cached_property
+    def code(self) -> str:
+        """Same text with string/char literals and comments blanked out (offsets preserved), for brace matching"""
+        return _comment_pattern(self.content).sub(_blank_literal_or_comment, self.content)
+
+    @cached_property
+    def line_offsets(self) -> List[int]:
+        """Offset of the first character of each line in content"""
+        return list(accumulate((len(line) + 1 for line in self.lines[:-1]), initial=0))
+
+
 class FunctionExtractor:
 
     def __init__(self, src_dir: str):
@@ -13,140 +160,201 @@ class FunctionExtractor:
 
         self.c_extensions = {'.c', '.cpp', '.cc', '.cxx', '.h', '.hpp', '.hxx'}
 
+        # (filepath, remove_comments) -> file content, reused while the file's mtime is unchanged
+        self._file_cache: Dict[Tuple[Path, bool], _SourceFile] = {}
+        # Source files from the last scan, valid while no directory in the tree has a new mtime
+        self._source_files: Optional[List[Path]] = None
+        # Every file of the last scan, whatever its extension, for lookups by file name
+        self._tree_files: List[Path] = []
+        self._directory_mtimes: Dict[Path, int] = {}
+        # remove_comments -> (indexed file versions, function name -> [(filepath, file version)]),
+        # rebuilt when any file of the tree resolves to a different version
+        self._function_indexes: Dict[bool, Tuple[Tuple[Optional[_SourceFile], ...],
+                                                 Dict[str, List[Tuple[Path, _SourceFile]]]]] = {}
+        # file name -> files with that name, built on first lookup by file name
+        self._name_index: Optional[Dict[str, List[Path]]] = None
+        # Process pool for list_all_functions(max_workers=...), kept across calls
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers = 0
+
     def extract_function(self, function_name: str, file_name: Optional[str] = None,
                          line_number: Optional[int] = None, remove_comments: bool = False) -> Optional[str]:
         """Extract function definition by name, optionally from a specific file and line number"""
         if file_name:
-            found_path = None
-            for root, dirs, files in os.walk(self.src_dir):
-                if file_name in files:
-                    found_path = Path(root) / file_name
-                    break
-            if not found_path or not found_path.exists():
+            candidates = self._get_name_index().get(file_name)
+            if not candidates or not candidates[0].exists():
                 raise FileNotFoundError(f"File not found: {file_name} in {self.src_dir} or its subdirectories")
-            filepath = found_path
 
-            return self._extract_from_file(filepath, function_name, line_number, remove_comments)
+            return self._extract_from_file(candidates[0], function_name, line_number, remove_comments)
         else:
             return self._extract_from_directory(function_name, line_number, remove_comments)
 
+    def _get_name_index(self) -> Dict[str, List[Path]]:
+        """Map every file name to its paths in the directory"""
+        # Explicitly named files need not have one of the C/C++ extensions (e.g. .inl, .cu)
+        self._get_all_source_files()
+        if self._name_index is None:
+            index = defaultdict(list)
+            for filepath in self._tree_files:
+                index[filepath.name].append(filepath)
+            self._name_index = dict(index)
+
+        return self._name_index
+
     def _extract_from_directory(self, function_name: str, line_number: Optional[int] = None, remove_comments: bool = False) -> Optional[str]:
         """Search for function across all C/C++ files in the directory"""
-        matches = []
-        for filepath in self._get_all_source_files():
+        if _IDENTIFIER_RE.fullmatch(function_name):
+            declarations = {filepath: (source, self._get_declarations(source)[function_name])
+                            for filepath, source in self._get_function_index(remove_comments).get(function_name, [])}
+        else:
+            declarations = self._scan_declarations(function_name, remove_comments)
+
+        if not declarations:
+            return None
+
+        # Return the first file that declares the function near line_number, or else the first match;
+        # only the chosen definition is extracted
+        filepaths = list(declarations)
+        filepath = filepaths[0]
+        if line_number and len(filepaths) > 1:
+            filepath = next((candidate for candidate in filepaths
+                             if self._is_declared_near(declarations[candidate][1], line_number)), filepath)
+
+        # The line indexes were found in this very version of the file
+        source, line_idxs = declarations[filepath]
+        start_idx = self._select_declaration(line_idxs, line_number)
+        return self._extract_complete_function(source, start_idx)
+
+    def _get_function_index(self, remove_comments: bool = False) -> Dict[str, List[Tuple[Path, _SourceFile]]]:
+        """Map every declared function name to the files declaring it, rescanning only files that changed"""
+        source_files = self._get_all_source_files()
+
+        # _read_source returns the cached version of unchanged files, so the index is current as long
+        # as every file still resolves to the version it was built from
+        sources = []
+        for filepath in source_files:
             try:
-                result = self._extract_from_file(filepath, function_name, line_number, remove_comments)
-                if result:
-                    matches.append((filepath, result))
-            except (UnicodeDecodeError, PermissionError):
+                sources.append(self._read_source(filepath, remove_comments))
+            except (UnicodeDecodeError, OSError):
+                sources.append(None)
+        sources = tuple(sources)
+
+        cached = self._function_indexes.get(remove_comments)
+        if cached is not None and cached[0] == sources:
+            return cached[1]
+
+        index = defaultdict(list)
+        for filepath, source in zip(source_files, sources):
+            if source is None:
                 continue
 
-        if not matches:
-            return None
+            for function_name in self._get_declarations(source):
+                index[function_name].append((filepath, source))
 
-        if len(matches) == 1:
-            return matches[0][1]
+        self._function_indexes[remove_comments] = (sources, dict(index))
+        return self._function_indexes[remove_comments][1]
 
-        # Multiple matches found - if line_number provided, use it to disambiguate
-        if line_number:
-            for filepath, function_code in matches:
-                if self._verify_line_number(filepath, function_name, line_number):
-                    return function_code
+    def _scan_declarations(self, function_name: str,
+                           remove_comments: bool = False) -> Dict[Path, Tuple[_SourceFile, List[int]]]:
+        """Find the declarations of a name that is not indexed by scanning every source file"""
+        declarations = {}
+        for filepath in self._get_all_source_files():
+            try:
+                source = self._read_source(filepath, remove_comments)
+            except (UnicodeDecodeError, OSError):
+                continue
 
-        # Return first match if no line number or line number doesn't help
-        return matches[0][1]
+            line_idxs = self._find_declaration_lines(source.lines, function_name)
+            if line_idxs:
+                declarations[filepath] = (source, line_idxs)
+
+        return declarations
+
+    def _get_declarations(self, source: _SourceFile) -> Dict[str, List[int]]:
+        """Map each function declared in a file to its declaration line indexes, once per file version"""
+        if source.declarations is None:
+            declarations = defaultdict(list)
+            for function_name, line_idx in self._find_declarations(source.content, source.lines):
+                declarations[function_name].append(line_idx)
+            source.declarations = dict(declarations)
+
+        return source.declarations
+
+    def _find_declarations(self, content: str, lines: List[str]) -> List[Tuple[str, int]]:
+        """Find all (function name, line index) declarations in content, ordered by line"""
+        declarations = []
+        checked = set()
+        line_idx = 0
+        last_pos = 0
+        for match in _CALL_RE.finditer(content):
+            line_idx += content.count('\n', last_pos, match.start())
+            last_pos = match.start()
+            function_name = match.group(1)
+
+            # A declaration may also start on the previous line (e.g. return type on its own line)
+            for i in (line_idx - 1, line_idx):
+                if i < 0 or (function_name, i) in checked:
+                    continue
+                checked.add((function_name, i))
+                if self._is_function_declaration(lines, i, function_name):
+                    declarations.append((function_name, i))
+
+        declarations.sort(key=lambda declaration: declaration[1])
+        return declarations
 
     def _extract_from_file(self, filepath: Path, function_name: str,
                            line_number: Optional[int] = None, remove_comments: bool = False) -> Optional[str]:
         """Extract function from a specific file"""
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as file:
-            content = file.read()
+        source = self._read_source(filepath, remove_comments)
+
+        return self._parse_function(source, function_name, line_number)
 
-        return self._parse_function(content, function_name, line_number, remove_comments)
+    def _read_source(self, filepath: Path, remove_comments: bool = False) -> _SourceFile:
+        """Read a source file, reusing the cached copy while the file is unchanged"""
+        mtime_ns = filepath.stat().st_mtime_ns
+        key = (filepath, remove_comments)
+        cached = self._file_cache.get(key)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
 
-    def _parse_function(self, content: str, function_name: str,
-                        line_number: Optional[int] = None, remove_comments: bool = False) -> Optional[str]:
-        """Parse and extract the function definition from content"""
         if remove_comments:
-            content = self._remove_comments(content)
-        lines = content.split('\n')
+            content = self._remove_comments(self._read_source(filepath).content)
+        else:
+            content = _read_file(filepath)
+
+        source = self._file_cache[key] = _SourceFile(mtime_ns, content)
+        return source
 
-        # Find all potential function matches
-        matches = []
-        for i in range(len(lines)):
-            if self._is_function_declaration(lines, i, function_name):
-                matches.append(i)
+    def _parse_function(self, source: _SourceFile, function_name: str,
+                        line_number: Optional[int] = None) -> Optional[str]:
+        """Parse and extract the function definition from a source file"""
+        matches = self._find_declaration_lines(source.lines, function_name)
 
         if not matches:
             return None
 
-        # If line_number provided, find the closest match
-        if line_number is not None:
-            best_match = min(matches, key=lambda x: abs(x + 1 - line_number))
-            return self._extract_complete_function(lines, best_match, function_name)
+        return self._extract_complete_function(source, self._select_declaration(matches, line_number))
 
-        return self._extract_complete_function(lines, matches[0], function_name)
+    def _find_declaration_lines(self, lines: List[str], function_name: str) -> List[int]:
+        """Find the indexes of all lines where function_name is declared"""
+        # Only lines mentioning the name, or directly preceding one, can start its declaration
+        candidate_idxs = set()
+        for i, line in enumerate(lines):
+            if function_name in line:
+                candidate_idxs.update((i - 1, i) if i else (i,))
 
-    def _remove_comments(self, content: str) -> str:
-        """Remove C/C++ comments while preserving strings"""
-        result = []
-        i = 0
-        in_string = False
-        in_char = False
-        string_char = None
-
-        while i < len(content):
-            char = content[i]
-
-            if (in_string or in_char) and char == '\\':
-                result.append(char)
-                if i + 1 < len(content):
-                    result.append(content[i + 1])
-                    i += 2
-                else:
-                    i += 1
-                continue
+        return [i for i in sorted(candidate_idxs) if self._is_function_declaration(lines, i, function_name)]
 
-            if char in ['"', "'"] and not in_char and not in_string:
-                in_string = True
-                string_char = char
-                result.append(char)
-            elif char == string_char and in_string:
-                in_string = False
-                string_char = None
-                result.append(char)
-            elif char == "'" and not in_string and not in_char:
-                in_char = True
-                result.append(char)
-            elif char == "'" and in_char:
-                in_char = False
-                result.append(char)
-            elif not in_string and not in_char:
-                if char == '/' and i + 1 < len(content):
-                    next_char = content[i + 1]
-                    if next_char == '/':
-                        while i < len(content) and content[i] != '\n':
-                            i += 1
-                        if i < len(content):
-                            result.append('\n')
-                        continue
-                    elif next_char == '*':
-                        i += 2
-                        while i + 1 < len(content):
-                            if content[i] == '*' and content[i + 1] == '/':
-                                i += 2
-                                break
-                            elif content[i] == '\n':
-                                result.append('\n')
-                            i += 1
-                        continue
-                result.append(char)
-            else:
-                result.append(char)
+    def _select_declaration(self, line_idxs: List[int], line_number: Optional[int] = None) -> int:
+        """Pick the declaration closest to line_number, or the first one if no line number is given"""
+        if line_number is not None:
+            return min(line_idxs, key=lambda x: abs(x + 1 - line_number))
 
-            i += 1
+        return line_idxs[0]
 
-        return ''.join(result)
+    def _remove_comments(self, content: str) -> str:
+        """Remove C/C++ comments while preserving strings and line numbers"""
+        return _comment_pattern(content).sub(_replace_comment, content)
 
     def _is_function_declaration(self, lines: List[str], start_idx: int, function_name: str) -> bool:
         """Check if the function is declared starting at lines[start_idx]"""
@@ -156,8 +364,8 @@ class FunctionExtractor:
             return False
 
         # Check if current line contains the function signature
-        pattern = rf'\b{re.escape(function_name)}\s*\('
-        if re.search(pattern, current_line):
+        pattern = _function_name_pattern(function_name)
+        if function_name in current_line and pattern.search(current_line):
             if not self._is_inside_string_or_macro(current_line, function_name):
                 return True
 
@@ -165,7 +373,7 @@ class FunctionExtractor:
             next_line = lines[start_idx + 1].strip()
             combined = current_line + " " + next_line
 
-            if re.search(pattern, combined):
+            if function_name in combined and pattern.search(combined):
                 if not self._is_inside_string_or_macro(combined, function_name):
                     if not current_line.endswith(';'):
                         return True
@@ -182,110 +390,93 @@ class FunctionExtractor:
 
         return False
 
-    def _extract_complete_function(self, lines: List[str], start_idx: int, function_name: str) -> str:
+    def _extract_complete_function(self, source: _SourceFile, start_idx: int) -> str:
         """Extract the complete function definition starting from start_idx"""
-        function_lines = []
-        i = start_idx
-
-        brace_found = False
-        while i < len(lines) and not brace_found:
-            line = lines[i]
-            function_lines.append(line)
-
-            if '{' in line:
-                brace_found = True
-
-            i += 1
-
-        if not brace_found:
-            return '\n'.join(function_lines)
-
-        brace_count = self._count_braces_in_lines(function_lines)
-
-        while i < len(lines) and brace_count > 0:
-            line = lines[i]
-            function_lines.append(line)
-
-            line_brace_count = self._count_braces_in_text(line)
-            brace_count += line_brace_count
-
-            if brace_count == 0:
-                break
-            i += 1
-
-        return '\n'.join(function_lines)
-
-    def _count_braces_in_lines(self, lines: List[str]) -> int:
-        """Count braces in multiple lines"""
-        return sum(self._count_braces_in_text(line) for line in lines)
+        content, code = source.content, source.code
+        start = source.line_offsets[start_idx]
+
+        brace_pos = content.find('{', start)
+        if brace_pos == -1:
+            return content[start:]
+
+        # Braces are counted on the blanked-out code, so those in strings and comments are ignored.
+        # The definition ends with the first line after which the braces are balanced.
+        line_end = self._line_end(content, brace_pos)
+        depth = code.count('{', start, line_end) - code.count('}', start, line_end)
+
+        while depth > 0:
+            for match in _BRACE_RE.finditer(code, line_end):
+                depth += 1 if match.group() == '{' else -1
+                if depth <= 0:
+                    break
+            else:
+                return content[start:]
 
-    def _count_braces_in_text(self, text: str) -> int:
-        """Count braces in text while ignoring those in strings and comments"""
-        count = 0
-        i = 0
-        in_string = False
-        in_char = False
-        string_char = None
+            # The rest of the line may reopen a block
+            brace_end = match.end()
+            line_end = self._line_end(content, brace_end)
+            depth += code.count('{', brace_end, line_end) - code.count('}', brace_end, line_end)
 
-        while i < len(text):
-            char = text[i]
+        return content[start:line_end]
 
-            if (in_string or in_char) and char == '\\':
-                i += 2
-                continue
+    def _line_end(self, content: str, pos: int) -> int:
+        """Offset of the newline ending the line that contains pos, or the end of content"""
+        line_end = content.find('\n', pos)
+        return line_end if line_end != -1 else len(content)
 
-            if char in ['"', "'"] and not in_char and not in_string:
-                in_string = True
-                string_char = char
-            elif char == string_char and in_string:
-                in_string = False
-                string_char = None
-            elif char == "'" and not in_string and not in_char:
-                in_char = True
-            elif char == "'" and in_char:
-                in_char = False
-            elif not in_string and not in_char:
-                if char == '/' and i + 1 < len(text):
-                    next_char = text[i + 1]
-                    if next_char == '/':
-                        break
-                    elif next_char == '*':
-                        i += 2
-                        continue
-
-                if char == '{':
-                    count += 1
-                elif char == '}':
-                    count -= 1
-
-            i += 1
-
-        return count
-
-    def _verify_line_number(self, filepath: Path, function_name: str, line_number: int) -> bool:
-        """Check if the function actually starts near the specified line number"""
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as file:
-            content = file.read()
-        lines = content.split('\n')
-
-        search_range = range(max(0, line_number - 3), min(len(lines), line_number + 3))
-
-        for i in search_range:
-            if self._is_function_declaration(lines, i, function_name):
-                return True
-
-        return False
+    def _is_declared_near(self, line_idxs: List[int], line_number: int) -> bool:
+        """Check if one of the indexed declarations starts near the specified line number"""
+        return any(line_number - 3 <= idx < line_number + 3 for idx in line_idxs)
 
     def _get_all_source_files(self) -> List[Path]:
-        """Get all C/C++ source files recursively"""
+        """Get all C/C++ source files recursively, rescanning only when a directory in the tree changes"""
+        if self._source_files is not None and self._directories_unchanged():
+            return self._source_files
+
+        # Adding, removing or renaming an entry only updates the mtime of its parent directory,
+        # so every directory of the tree is recorded, before it is listed
+        directory_mtimes = {self.src_dir: self.src_dir.stat().st_mtime_ns}
+        tree_files = []
         files = []
-        for filepath in self.src_dir.rglob('*'):
-            if filepath.is_file() and filepath.suffix.lower() in self.c_extensions:
-                files.append(filepath)
+        # Top-down os.walk keeps the order in which the first match for a name is picked
+        for root, dirnames, filenames in os.walk(self.src_dir):
+            root = Path(root)
+            for dirname in dirnames:
+                directory = root / dirname
+                directory_mtimes[directory] = directory.stat().st_mtime_ns
+            for filename in filenames:
+                filepath = root / filename
+                tree_files.append(filepath)
+                if filepath.suffix.lower() in self.c_extensions and filepath.is_file():
+                    files.append(filepath)
+
+        self._source_files = files
+        self._tree_files = tree_files
+        self._directory_mtimes = directory_mtimes
+        # The indexes were built from the previous scan
+        self._function_indexes.clear()
+        self._name_index = None
         return files
 
-    def list_all_functions(self, file_name: Optional[str] = None, remove_comments: bool = False) -> List[Tuple[str, str, str]]:
-        """List all functions with their signatures and file paths"""
+    def _directories_unchanged(self) -> bool:
+        """Check that no directory of the last scan was modified or removed"""
+        for directory, mtime_ns in self._directory_mtimes.items():
+            try:
+                if directory.stat().st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+
+        return True
+
+    def list_all_functions(self, file_name: Optional[str] = None, remove_comments: bool = False,
+                           max_workers: Optional[int] = None) -> List[Tuple[str, str, str]]:
+        """List all functions with their signatures and file paths
+
+        With max_workers > 1, trees of at least _PARALLEL_MIN_FILES files are parsed in a process
+        pool that is kept for later calls (see close()). Pooled parsing bypasses the file cache, and
+        the serial path is used whenever worker processes cannot be started.
+        """
         functions = []
 
         if file_name:
@@ -297,48 +488,59 @@ class FunctionExtractor:
                     functions.append((name, signature, str(filepath)))
         else:
             # List functions from all files
-            for filepath in self._get_all_source_files():
-                try:
-                    file_functions = self._list_functions_in_file(filepath, remove_comments=remove_comments)
-                    for name, signature in file_functions:
-                        functions.append((name, signature, str(filepath)))
-                except (UnicodeDecodeError, PermissionError):
+            filepaths = self._get_all_source_files()
+            results = None
+            if max_workers is not None and max_workers > 1 and len(filepaths) >= _PARALLEL_MIN_FILES:
+                results = self._list_functions_in_pool(filepaths, remove_comments, max_workers)
+            if results is None:
+                results = []
+                for filepath in filepaths:
+                    try:
+                        results.append(self._list_functions_in_file(filepath, remove_comments=remove_comments))
+                    except (UnicodeDecodeError, PermissionError):
+                        results.append(None)
+
+            for filepath, file_functions in zip(filepaths, results):
+                if file_functions is None:
                     continue
+                for name, signature in file_functions:
+                    functions.append((name, signature, str(filepath)))
 
         return functions
 
-    def _list_functions_in_file(self, filepath: Path, remove_comments: bool = False) -> List[Tuple[str, str]]:
-        """Extract all function signatures from a single file"""
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as file:
-            content = file.read()
+    def _list_functions_in_pool(self, filepaths: List[Path], remove_comments: bool,
+                                max_workers: int) -> Optional[List[Optional[List[Tuple[str, str]]]]]:
+        """Parse the files in the process pool, or return None when it cannot be used"""
+        # Daemonic processes (e.g. multiprocessing.Pool workers) are not allowed to have children
+        if multiprocessing.current_process().daemon:
+            return None
 
-        if remove_comments:
-            content = self._remove_comments(content)
-
-        pattern = r'''
-            (?:^|\n)                    # Start of line
-            \s*                         # Optional whitespace
-            (?:static\s+|extern\s+|inline\s+)*  # Optional storage specifiers
-            (\w+(?:\s*\*+\s*|\s+))      # Return type (group 1)
-            (\w+)                       # Function name (group 2)
-            \s*\(                       # Opening parenthesis
-            ([^{;]*)                    # Parameters (group 3)
-            \)\s*                       # Closing parenthesis
-            (?=\{)                      # Followed by opening brace (lookahead)
-        '''
-
-        matches = re.finditer(pattern, content, re.MULTILINE | re.VERBOSE)
-        functions = []
+        if self._executor is None or self._executor_workers != max_workers:
+            self.close()
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+            self._executor_workers = max_workers
+
+        try:
+            return list(self._executor.map(_list_functions_in_file_worker, filepaths,
+                                           repeat(remove_comments), chunksize=16))
+        except (OSError, RuntimeError):
+            # Workers could not be started (resource limits, spawn without a __main__ guard, ...);
+            # BrokenProcessPool is a RuntimeError
+            self.close()
+            return None
 
-        for match in matches:
-            return_type = match.group(1).strip()
-            function_name = match.group(2).strip()
-            params = match.group(3).strip()
+    def close(self):
+        """Shut down the process pool used by list_all_functions, if any"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._executor_workers = 0
 
-            signature = f"{function_name}({params})" if params else f"{function_name}()"
-            functions.append((function_name, signature))
+    def _list_functions_in_file(self, filepath: Path, remove_comments: bool = False) -> List[Tuple[str, str]]:
+        """Extract all function signatures from a single file"""
+        content = self._read_source(filepath, remove_comments).content
 
-        return functions
+        return _list_functions_in_content(content)
 
     def find_function_locations(self, function_name: str) -> List[Tuple[str, int]]:
         """Find all locations where a function is defined"""
@@ -346,12 +548,10 @@ class FunctionExtractor:
 
         for filepath in self._get_all_source_files():
             try:
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as file:
-                    lines = file.readlines()
+                lines = self._read_source(filepath).lines
 
-                for i, line in enumerate(lines):
-                    if self._is_function_declaration(lines, i, function_name):
-                        locations.append((str(filepath), i + 1))
+                for i in self._find_declaration_lines(lines, function_name):
+                    locations.append((str(filepath), i + 1))
             except (UnicodeDecodeError, PermissionError):
                 continue
 
@@ -1,7 +1,89 @@
+import signal
 import subprocess
 import time
-import json
+import ujson
 import os
+import shutil
+import threading
+from collections import deque
+from functools import lru_cache
+
+
+# Processed traces are written event by event; a large buffer keeps the number of write calls low
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Only the end of the instrumented run's output is needed (timing line, error report)
+_OUTPUT_TAIL_LINES = 64
+
+# How long to wait for the output readers once the process group has been killed
+_READER_JOIN_TIMEOUT = 5
+
+# Bytes of output decoded at first when looking for the timing line
+_TIMING_TAIL_BYTES = 4096
+
+
+def _third_last_line(output: bytes):
+    # Same as output.decode('utf-8', 'replace').rstrip().splitlines()[-3], but only the end of the
+    # output is decoded; the window grows until the line is known to lie entirely inside it
+    window = _TIMING_TAIL_BYTES
+    while True:
+        lines = output[-window:].decode('utf-8', errors='replace').rstrip().splitlines()
+        if window >= len(output):
+            return lines[-3] if len(lines) >= 3 else None
+        # The first line of a partial window may be cut short
+        if len(lines) >= 4:
+            return lines[-3]
+        window *= 4
+
+
+@lru_cache(maxsize=None)
+def _uftrace_executable() -> str:
+    # Resolved once so that every dump does not search PATH again; if uftrace is missing,
+    # the bare name is kept and the spawn reports it as before
+    return shutil.which('uftrace') or 'uftrace'
+
+
+def _run_with_output_tail(command, cwd, timeout) -> subprocess.CompletedProcess:
+    # Like subprocess.run(capture_output=True), but only the last lines of each stream are kept
+    stdout_tail = deque(maxlen=_OUTPUT_TAIL_LINES)
+    stderr_tail = deque(maxlen=_OUTPUT_TAIL_LINES)
+    deadline = time.monotonic() + timeout
+
+    # In its own session, so that the child and every descendant sharing its pipes
+    # (e.g. the program traced by uftrace) can be killed as one process group
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd,
+                               start_new_session=True)
+    # Both pipes are drained concurrently so that the child never blocks on a full one
+    readers = [threading.Thread(target=stdout_tail.extend, args=(process.stdout,), daemon=True),
+               threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    try:
+        returncode = process.wait(timeout=timeout)
+
+        # Descendants may keep the pipes open after the child exits; like subprocess.run,
+        # reading the output counts against the same timeout
+        for reader in readers:
+            reader.join(max(0, deadline - time.monotonic()))
+        if any(reader.is_alive() for reader in readers):
+            raise subprocess.TimeoutExpired(command, timeout)
+    except BaseException:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+        # Bounded, in case a descendant left the process group and still holds a pipe
+        join_deadline = time.monotonic() + _READER_JOIN_TIMEOUT
+        for reader in readers:
+            reader.join(max(0, join_deadline - time.monotonic()))
+        raise
+
+    process.stdout.close()
+    process.stderr.close()
+    return subprocess.CompletedProcess(command, returncode, b''.join(stdout_tail), b''.join(stderr_tail))
 
 
 class UftraceService:
@@ -9,40 +91,82 @@ class UftraceService:
     def __init__(self, cwd=None) -> None:
         self.cwd = cwd or os.getcwd()
 
-    def _process_trace_json(self, input_file) -> list:
-        try:
-            with open(input_file, 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            raise Exception(f"Trace JSON file not found: {input_file}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"Invalid JSON in trace file: {e}")
+        # (vanilla command, full command, build, only_vanilla) validated once by configure()
+        self._trace_config = None
 
+    def _process_trace_data(self, data, output_file, rewrite=True) -> list:
         if 'traceEvents' not in data:
             raise Exception("JSON file doesn't contain 'traceEvents' array")
 
-        for event in data['traceEvents']:
-            if 'tid' not in event and 'pid' in event:
-                event['tid'] = event['pid']
-
-        data['traceEvents'] = [event for event in data['traceEvents']
-                               if event.get('ph') in ['B', 'E']]
-
+        funcs = []
+        # Function name -> srclines already collected for it; avoids a key tuple per event
+        seen = {}
+        # Local bindings keep attribute lookups out of the per-event loop
+        kept_phases = frozenset(('B', 'E'))
+        seen_get = seen.get
+        funcs_append = funcs.append
+
+        if not rewrite:
+            # Only the functions are needed; leave the trace file as uftrace wrote it
+            for event in data['traceEvents']:
+                if event.get('ph') == 'B':
+                    name = event['name']
+                    srcline = event.get('args', {}).get('srcline', None)
+                    srclines = seen_get(name)
+                    if srclines is None:
+                        seen[name] = {srcline}
+                        funcs_append({'name': name, 'srcline': srcline})
+                    elif srcline not in srclines:
+                        srclines.add(srcline)
+                        funcs_append({'name': name, 'srcline': srcline})
+
+            return funcs
+
+        # Filter, patch, write out and collect the functions in a single pass; the filtered
+        # events are written one by one, without indentation, to a temporary file that then
+        # replaces the trace
+        dumps = ujson.dumps
+        temp_file = f"{output_file}.tmp"
         try:
-            json.dump(data['traceEvents'], open(input_file, 'w'), indent=1)
-        except IOError as e:
-            raise Exception(f"Failed to write processed JSON: {e}")
+            with open(temp_file, 'w', buffering=_WRITE_BUFFER_SIZE) as f:
+                write = f.write
+                write('[')
+                separator = '\n'
+                for event in data['traceEvents']:
+                    ph = event.get('ph')
+                    if ph not in kept_phases:
+                        continue
+
+                    if 'tid' not in event and 'pid' in event:
+                        event['tid'] = event['pid']
+
+                    write(separator)
+                    write(dumps(event, escape_forward_slashes=False))
+                    separator = ',\n'
+
+                    if ph == 'B':
+                        name = event['name']
+                        srcline = event.get('args', {}).get('srcline', None)
+                        srclines = seen_get(name)
+                        if srclines is None:
+                            seen[name] = {srcline}
+                            funcs_append({'name': name, 'srcline': srcline})
+                        elif srcline not in srclines:
+                            srclines.add(srcline)
+                            funcs_append({'name': name, 'srcline': srcline})
+                write('\n]')
+
+            os.replace(temp_file, output_file)
+        except BaseException as e:
+            # Do not leave a partially written trace behind, whatever interrupted the pass
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
 
-        funcs = []
-        seen = set()
-        for event in data['traceEvents']:
-            if event.get('ph') == 'B':
-                name = event['name']
-                srcline = event.get('args', {}).get('srcline', None)
-                key = (name, srcline)
-                if key not in seen:
-                    seen.add(key)
-                    funcs.append({'name': name, 'srcline': srcline})
+            if isinstance(e, IOError):
+                raise Exception(f"Failed to write processed JSON: {e}")
+            raise
 
         return funcs
 
@@ -66,25 +190,34 @@ class UftraceService:
         except Exception as e:
             raise Exception(f"Vanilla execution failed: {e}")
 
-    def _run_instrumented_execution(self, command, output_name, timeout=400) -> tuple[float, str, subprocess.CompletedProcess[bytes], list]:
+    def _run_instrumented_execution(self, command, output_name, timeout=400,
+                                    rewrite_trace=True) -> tuple[float, str, subprocess.CompletedProcess[bytes], list]:
         try:
-            process = subprocess.run(
-                command, capture_output=True, cwd=self.cwd, timeout=timeout)
-
-            stderr_output = process.stderr.decode('utf-8', errors='replace')
-            stdout_output = process.stdout.decode('utf-8', errors='replace')
+            process = _run_with_output_tail(command, self.cwd, timeout)
 
             if process.returncode != 0:
+                stderr_output = process.stderr.decode('utf-8', errors='replace')
                 print(f"Instrumented stderr: {stderr_output}")
 
+            # Parsed before dumping, so that a run without timing output fails before the
+            # dump and trace processing are paid for
+            elapsed_line = _third_last_line(process.stdout)
+            if elapsed_line is None:
+                raise Exception(
+                    "Insufficient output lines to extract execution time")
+
+            try:
+                execution_time = float(elapsed_line.split(":")[1].split()[0])
+            except (IndexError, ValueError) as e:
+                raise Exception(f"Failed to parse execution time: {e}")
+
             output_file = f"{output_name}.json"
             output_path = os.path.join(self.cwd, output_file)
 
             try:
-                with open(output_path, 'w') as f:
-                    dump_process = subprocess.run(['uftrace', 'dump', '--chrome', '--demangle=full', '--srcline'],
-                                                  stdout=f, cwd=self.cwd, timeout=450,
-                                                  stderr=subprocess.PIPE)
+                # The dump is read from the pipe rather than written to disk and read back
+                dump_process = subprocess.run([_uftrace_executable(), 'dump', '--chrome', '--demangle=full', '--srcline'],
+                                              capture_output=True, cwd=self.cwd, timeout=450)
                 if dump_process.returncode != 0:
                     stderr = dump_process.stderr.decode(
                         'utf-8', errors='replace')
@@ -97,22 +230,27 @@ class UftraceService:
             except Exception as e:
                 raise Exception(f"Failed to create trace dump: {e}")
 
-            if not os.path.exists(output_path):
-                raise Exception(
-                    f"Trace output file was not created: {output_path}")
+            raw_dump = dump_process.stdout
+            dump_process = None
+            try:
+                data = ujson.loads(raw_dump)
+            except ValueError as e:
+                raise Exception(f"Invalid JSON in uftrace dump output: {e}")
 
             absolute_path = os.path.abspath(output_path)
-            functions = self._process_trace_json(absolute_path)
+            if not rewrite_trace:
+                # Keep the trace as uftrace dumped it
+                with open(absolute_path, 'wb') as f:
+                    f.write(raw_dump)
+            # Only the parsed events are needed from here on, so the dump bytes are not kept
+            # alive while the trace is processed
+            raw_dump = None
 
-            try:
-                stdout_lines = stdout_output.rstrip().splitlines()
-                if len(stdout_lines) < 3:
-                    raise Exception(
-                        "Insufficient output lines to extract execution time")
-                execution_time = float(
-                    stdout_lines[-3].split(":")[1].split()[0])
-            except (IndexError, ValueError) as e:
-                raise Exception(f"Failed to parse execution time: {e}")
+            functions = self._process_trace_data(data, absolute_path, rewrite=rewrite_trace)
+
+            if not os.path.exists(output_path):
+                raise Exception(
+                    f"Trace output file was not created: {output_path}")
 
             return execution_time, absolute_path, process, functions
 
@@ -122,66 +260,80 @@ class UftraceService:
         except Exception as e:
             raise Exception(f"Instrumented execution failed: {e}")
 
-    def trace(self, vanilla_command, full_command, parameters, build,
-              output_name="trace_output", only_vanilla=False) -> dict:
-        try:
-            if not vanilla_command or not isinstance(vanilla_command, list):
-                raise Exception(
-                    "Invalid vanilla_command: must be a non-empty list")
+    def _validate_trace_config(self, vanilla_command, full_command, build, only_vanilla):
+        if not vanilla_command or not isinstance(vanilla_command, list):
+            raise Exception(
+                "Invalid vanilla_command: must be a non-empty list")
 
-            if not only_vanilla and (not full_command or not isinstance(full_command, list)):
-                raise Exception(
-                    "Invalid full_command: must be a non-empty list")
+        if not only_vanilla and (not full_command or not isinstance(full_command, list)):
+            raise Exception(
+                "Invalid full_command: must be a non-empty list")
 
-            if not build or 'type' not in build or 'range' not in build:
-                raise Exception(
-                    "Invalid build configuration: must contain 'type' and 'range'")
-
-            if only_vanilla:
-                elapsed_time, process = self._run_vanilla_execution(
-                    vanilla_command, timeout=20)
-
-                document = {
-                    'build': {'type': build['type'], 'range': build['range']},
-                    'times': {'vanilla': elapsed_time},
-                    'parameters': parameters,
-                    'success': process.returncode == 0
-                }
-
-                print(f"Vanilla execution completed in {elapsed_time:.3f}s")
-
-                return document
-
-            full_time, json_path, full_process, functions = self._run_instrumented_execution(
-                full_command, output_name
-            )
-
-            stdout_lines = full_process.stdout.decode(
-                'utf-8', errors='replace').rstrip().splitlines()
-            if stdout_lines:
-                if len(stdout_lines) >= 3:
-                    elapsed_line = stdout_lines[-3].strip()
-                    try:
-                        elapsed_value = elapsed_line.split(":")[1].split()[0]
-                        print(
-                            f"Elapsed time: {elapsed_value:.3f}s | Build: {build['type']} {build['range']} | Return code: {full_process.returncode}")
-                    except Exception:
-                        print(
-                            f"{elapsed_line} | Build: {build['type']} {build['range']} | Return code: {full_process.returncode}")
-                else:
-                    print(
-                        f"Elapsed time: N/A | Build: {build['type']} {build['range']} | Return code: {full_process.returncode}")
+        if not build or 'type' not in build or 'range' not in build:
+            raise Exception(
+                "Invalid build configuration: must contain 'type' and 'range'")
+
+    def _run_trace(self, vanilla_command, full_command, parameters, build,
+                   output_name, only_vanilla, rewrite_trace) -> dict:
+        if only_vanilla:
+            elapsed_time, process = self._run_vanilla_execution(
+                vanilla_command, timeout=20)
 
             document = {
                 'build': {'type': build['type'], 'range': build['range']},
-                'times': {'full': full_time},
+                'times': {'vanilla': elapsed_time},
                 'parameters': parameters,
-                'json_trace_path': json_path,
-                'functions': functions,
-                'success': full_process.returncode == 0
+                'success': process.returncode == 0
             }
 
+            print(f"Vanilla execution completed in {elapsed_time:.3f}s")
+
             return document
 
+        full_time, json_path, full_process, functions = self._run_instrumented_execution(
+            full_command, output_name, rewrite_trace=rewrite_trace
+        )
+
+        # full_time is the elapsed time already parsed from the instrumented run's stdout
+        print(
+            f"Elapsed time: {full_time:.3f}s | Build: {build['type']} {build['range']} | Return code: {full_process.returncode}")
+
+        document = {
+            'build': {'type': build['type'], 'range': build['range']},
+            'times': {'full': full_time},
+            'parameters': parameters,
+            'json_trace_path': json_path,
+            'functions': functions,
+            'success': full_process.returncode == 0
+        }
+
+        return document
+
+    def configure(self, vanilla_command, full_command, build, only_vanilla=False) -> None:
+        self._validate_trace_config(vanilla_command, full_command, build, only_vanilla)
+
+        # Frozen copies, so later changes to the caller's lists cannot bypass the validation
+        self._trace_config = (tuple(vanilla_command),
+                              None if only_vanilla else tuple(full_command),
+                              {'type': build['type'], 'range': build['range']},
+                              only_vanilla)
+
+    def trace_configured(self, parameters, output_name="trace_output", rewrite_trace=True) -> dict:
+        if self._trace_config is None:
+            raise Exception("No trace configuration: call configure() first")
+
+        vanilla_command, full_command, build, only_vanilla = self._trace_config
+        try:
+            return self._run_trace(vanilla_command, full_command, parameters, build,
+                                   output_name, only_vanilla, rewrite_trace)
+        except Exception as e:
+            raise Exception(f"Unexpected error during tracing: {e}")
+
+    def trace(self, vanilla_command, full_command, parameters, build,
+              output_name="trace_output", only_vanilla=False, rewrite_trace=True) -> dict:
+        try:
+            self._validate_trace_config(vanilla_command, full_command, build, only_vanilla)
+            return self._run_trace(vanilla_command, full_command, parameters, build,
+                                   output_name, only_vanilla, rewrite_trace)
         except Exception as e:
             raise Exception(f"Unexpected error during tracing: {e}")